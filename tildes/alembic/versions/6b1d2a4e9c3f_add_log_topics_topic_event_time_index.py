@@ -0,0 +1,38 @@
+"""Add log_topics topic_id/event_time index
+
+Revision ID: 6b1d2a4e9c3f
+Revises: 2c50cb4dd1b8
+Create Date: 2026-10-14 18:10:42.518305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "6b1d2a4e9c3f"
+down_revision = "2c50cb4dd1b8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        op.f("ix_log_topics_topic_id_event_time_desc"),
+        "log_topics",
+        ["topic_id", sa.text("event_time DESC")],
+        unique=False,
+    )
+
+    # the new index covers lookups by topic_id alone, so the old one isn't needed
+    op.drop_index(op.f("ix_log_topics_topic_id"), table_name="log_topics")
+
+
+def downgrade():
+    op.create_index(
+        op.f("ix_log_topics_topic_id"), "log_topics", ["topic_id"], unique=False
+    )
+
+    op.drop_index(
+        op.f("ix_log_topics_topic_id_event_time_desc"), table_name="log_topics"
+    )
@@ -0,0 +1,68 @@
+"""Add group topic listing indexes
+
+Revision ID: 93b7e0d5a216
+Revises: 6b1d2a4e9c3f
+Create Date: 2026-10-14 18:12:37.204861
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "93b7e0d5a216"
+down_revision = "6b1d2a4e9c3f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_topics_group_id_created_time_keyset",
+        "topics",
+        ["group_id", sa.text("created_time DESC"), sa.text("topic_id DESC")],
+        unique=False,
+        postgresql_where=sa.text("NOT is_deleted AND NOT is_removed"),
+    )
+    op.create_index(
+        "ix_topics_group_id_last_activity_time_keyset",
+        "topics",
+        ["group_id", sa.text("last_activity_time DESC"), sa.text("topic_id DESC")],
+        unique=False,
+        postgresql_where=sa.text("NOT is_deleted AND NOT is_removed"),
+    )
+    op.create_index(
+        "ix_topics_group_id_last_interesting_activity_time_keyset",
+        "topics",
+        [
+            "group_id",
+            sa.text("last_interesting_activity_time DESC"),
+            sa.text("topic_id DESC"),
+        ],
+        unique=False,
+        postgresql_where=sa.text("NOT is_deleted AND NOT is_removed"),
+    )
+    op.create_index(
+        "ix_topics_group_id_num_comments_keyset",
+        "topics",
+        ["group_id", sa.text("num_comments DESC"), sa.text("topic_id DESC")],
+        unique=False,
+        postgresql_where=sa.text("NOT is_deleted AND NOT is_removed"),
+    )
+    op.create_index(
+        "ix_topics_group_id_num_votes_keyset",
+        "topics",
+        ["group_id", sa.text("num_votes DESC"), sa.text("topic_id DESC")],
+        unique=False,
+        postgresql_where=sa.text("NOT is_deleted AND NOT is_removed"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_topics_group_id_num_votes_keyset", table_name="topics")
+    op.drop_index("ix_topics_group_id_num_comments_keyset", table_name="topics")
+    op.drop_index(
+        "ix_topics_group_id_last_interesting_activity_time_keyset", table_name="topics"
+    )
+    op.drop_index("ix_topics_group_id_last_activity_time_keyset", table_name="topics")
+    op.drop_index("ix_topics_group_id_created_time_keyset", table_name="topics")
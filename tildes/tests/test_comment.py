@@ -229,3 +229,17 @@ def test_comment_tree(db, topic, session_user):
     db.commit()
     tree = list(CommentTree(all_comments, sort))
     assert not tree
+
+
+def test_comment_tree_from_iterator(db, topic, session_user):
+    """Ensure that a comment tree can be built from a single-pass iterator."""
+    root = Comment(topic, session_user, "root")
+    child = Comment(topic, session_user, "child", parent_comment=root)
+    db.add_all([root, child])
+    db.commit()
+
+    tree = CommentTree(iter([root, child]), CommentTreeSortOption.POSTED)
+
+    assert list(tree) == [root]
+    assert root.replies == [child]
+    assert len(tree) == 2
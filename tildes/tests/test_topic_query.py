@@ -0,0 +1,203 @@
+# Copyright (c) 2018 Tildes contributors <code@tildes.net>
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+from datetime import timedelta
+
+from pyramid.testing import DummyRequest
+
+from tildes.enums import TopicSortOption
+from tildes.lib.datetime import utc_now
+from tildes.models.group import Group
+from tildes.models.topic import Topic, TopicQuery, TopicVisit, TopicVote
+from tildes.models.topic.topic_query import _GROUP_IDS_WITH_SUBGROUPS_CACHE
+
+
+def _create_topics(db, group, user, num_topics):
+    """Create num_topics text topics, the db fixture rolls them back afterwards."""
+    topics = [
+        Topic.create_text_topic(group, user, f"Topic {num}", "the text")
+        for num in range(num_topics)
+    ]
+    db.add_all(topics)
+    db.commit()
+
+    return topics
+
+
+def _create_visit(db, user, topic, visit_time):
+    """Create a visit to the topic at a specific time."""
+    visit = TopicVisit(user, topic)
+    visit.visit_time = visit_time
+    db.add(visit)
+    db.commit()
+
+    return visit
+
+
+def test_listing_query_joins_groups_once(db, session_user, session_group):
+    """Ensure a topic listing query only joins the groups table a single time."""
+    request = DummyRequest(db_session=db, user=session_user)
+    query = (
+        TopicQuery(request)
+        .join_all_relationships()
+        .inside_groups([session_group])
+        .exclude_ignored()
+        .apply_sort_option(TopicSortOption.ACTIVITY)
+    )
+
+    sql = str(query)
+
+    assert sql.count("JOIN groups") == 1
+
+    # the user's votes and visits are fetched separately, not joined in
+    assert "topic_votes" not in sql
+    assert "topic_visits" not in sql
+
+
+def test_merged_user_voted(db, session_user, session_group):
+    """Ensure only the topics the user voted on have user_voted set."""
+    voted_topic, other_topic = _create_topics(db, session_group, session_user, 2)
+    db.add(TopicVote(session_user, voted_topic))
+    db.commit()
+
+    request = DummyRequest(db_session=db, user=session_user)
+    topics = TopicQuery(request).filter(
+        Topic.topic_id.in_([voted_topic.topic_id, other_topic.topic_id])
+    )
+
+    assert {topic.topic_id: topic.user_voted for topic in topics} == {
+        voted_topic.topic_id: True,
+        other_topic.topic_id: False,
+    }
+
+
+def test_merged_last_visit_is_newest(db, session_user, session_group):
+    """Ensure the newest of multiple visits is used as the last visit."""
+    (topic,) = _create_topics(db, session_group, session_user, 1)
+    _create_visit(db, session_user, topic, utc_now() - timedelta(days=2))
+    newest_visit = _create_visit(db, session_user, topic, utc_now() - timedelta(days=1))
+
+    request = DummyRequest(db_session=db, user=session_user)
+    (queried_topic,) = TopicQuery(request).filter(Topic.topic_id == topic.topic_id)
+
+    assert queried_topic.last_visit_time == newest_visit.visit_time
+    assert queried_topic.comments_since_last_visit == 0
+
+
+def test_merged_comments_since_last_visit_not_negative(db, session_user, session_group):
+    """Ensure deletions after a visit don't cause negative new comments."""
+    (topic,) = _create_topics(db, session_group, session_user, 1)
+    visit = _create_visit(db, session_user, topic, utc_now() - timedelta(days=1))
+
+    # the visit saw more comments than the topic has now, as if some were deleted
+    visit.num_comments = topic.num_comments + 2
+    db.commit()
+
+    request = DummyRequest(db_session=db, user=session_user)
+    (queried_topic,) = TopicQuery(request).filter(Topic.topic_id == topic.topic_id)
+
+    assert queried_topic.comments_since_last_visit == 0
+
+
+def test_merged_no_visit(db, session_user, session_group):
+    """Ensure a topic the user hasn't visited has no last visit data."""
+    (topic,) = _create_topics(db, session_group, session_user, 1)
+
+    request = DummyRequest(db_session=db, user=session_user)
+    (queried_topic,) = TopicQuery(request).filter(Topic.topic_id == topic.topic_id)
+
+    assert queried_topic.last_visit_time is None
+    assert queried_topic.comments_since_last_visit is None
+
+
+def test_logged_out_default_user_context(db, session_user, session_group):
+    """Ensure a logged-out query leaves topics with the default user context."""
+    (topic,) = _create_topics(db, session_group, session_user, 1)
+    db.add(TopicVote(session_user, topic))
+    db.commit()
+    _create_visit(db, session_user, topic, utc_now() - timedelta(days=1))
+
+    request = DummyRequest(db_session=db, user=None)
+    (queried_topic,) = TopicQuery(request).filter(Topic.topic_id == topic.topic_id)
+
+    assert queried_topic.user_context == Topic.user_context
+
+
+def test_merged_data_on_reversed_page(db, session_user, session_group):
+    """Ensure the vote and visit data is merged onto a "before" (reversed) page."""
+    anchor_topic, later_topic = _create_topics(db, session_group, session_user, 2)
+    db.add(TopicVote(session_user, later_topic))
+    db.commit()
+    visit = _create_visit(db, session_user, later_topic, utc_now() - timedelta(days=1))
+
+    request = DummyRequest(db_session=db, user=session_user)
+    query = (
+        TopicQuery(request)
+        .inside_groups([session_group])
+        .before_id36(anchor_topic.topic_id36)
+    )
+    assert query.is_reversed
+
+    queried_topic = next(
+        topic for topic in query if topic.topic_id == later_topic.topic_id
+    )
+
+    assert queried_topic.user_voted
+    assert queried_topic.last_visit_time == visit.visit_time
+
+
+def test_inside_groups_includes_subgroups(db, session_user, session_group):
+    """Ensure restricting to a group also includes topics in its subgroups."""
+    subgroup = Group(f"{session_group.path}.subgroup")
+    db.add(subgroup)
+    db.commit()
+    (topic,) = _create_topics(db, subgroup, session_user, 1)
+
+    request = DummyRequest(db_session=db, user=session_user)
+    query = TopicQuery(request).inside_groups([session_group])
+
+    assert topic in query.all()
+
+
+def test_group_changes_clear_subgroup_cache(db, session_user, session_group):
+    """Ensure inserting or updating a group clears the cached subgroup IDs."""
+    request = DummyRequest(db_session=db, user=session_user)
+
+    TopicQuery(request).inside_groups([session_group])
+    assert _GROUP_IDS_WITH_SUBGROUPS_CACHE
+
+    subgroup = Group(f"{session_group.path}.subgroup")
+    db.add(subgroup)
+    db.commit()
+    assert not _GROUP_IDS_WITH_SUBGROUPS_CACHE
+
+    TopicQuery(request).inside_groups([session_group])
+    assert _GROUP_IDS_WITH_SUBGROUPS_CACHE
+
+    subgroup.short_description = "a new description"
+    db.commit()
+    assert not _GROUP_IDS_WITH_SUBGROUPS_CACHE
+
+
+def test_exclude_tags_with_subtags(db, session_user, session_group):
+    """Ensure excluded tags also exclude their sub-tags, including with spaces."""
+    topics = _create_topics(db, session_group, session_user, 5)
+    tags_by_topic = [
+        ["video games"],
+        ["video games.retro"],
+        ["science"],
+        ["science.physics"],
+        ["other"],
+    ]
+    for topic, tags in zip(topics, tags_by_topic):
+        topic.tags = tags
+    db.commit()
+
+    request = DummyRequest(db_session=db, user=session_user)
+    query = (
+        TopicQuery(request)
+        .filter(Topic.topic_id.in_([topic.topic_id for topic in topics]))
+        .exclude_tags(["video games", "science"])
+    )
+
+    assert query.all() == [topics[4]]
@@ -1,6 +1,8 @@
 # Copyright (c) 2018 Tildes contributors <code@tildes.net>
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+from tildes.schemas.topic import TopicSchema
+
 
 def test_tags_whitespace_stripped(text_topic):
     """Ensure excess whitespace around tags gets stripped."""
@@ -36,3 +38,15 @@ def test_tags_synonyms(text_topic):
     """ Ensure synonyms are replaced."""
     text_topic.tags = ["spoilers"]
     assert text_topic.tags == ["spoiler"]
+
+
+def test_tags_comma_separated_string():
+    """Ensure a comma-separated string of tags is split into separate tags."""
+    result = TopicSchema(only=("tags",)).load({"tags": "one, two,,three"})
+    assert result["tags"] == ["one", "two", "three"]
+
+
+def test_tags_comma_separated_in_list():
+    """Ensure comma-separated tags inside a list (as from a form) are split."""
+    result = TopicSchema(only=("tags",)).load({"tags": ["one, two", "three"]})
+    assert result["tags"] == ["one", "two", "three"]
@@ -45,6 +45,12 @@ _HISTOGRAMS = {
         "Markdown processing",
         buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0],
     ),
+    "comment_tree_building": Histogram(
+        "tildes_comment_tree_building_seconds",
+        "Comment tree building time",
+        labelnames=["num_comments_range"],
+        buckets=[0.00001, 0.0001, 0.001, 0.01, 0.05, 0.1, 0.5, 1.0],
+    ),
     "comment_tree_sorting": Histogram(
         "tildes_comment_tree_sorting_seconds",
         "Comment tree sorting time",
@@ -7,6 +7,7 @@ from typing import Any
 
 from pyramid.request import Request
 from sqlalchemy.orm import joinedload
+from sqlalchemy.sql.expression import and_, label
 
 from tildes.lib.id import id_to_id36
 from tildes.models.pagination import PaginatedQuery, PaginatedResults
@@ -34,16 +35,16 @@ class CommentNotificationQuery(PaginatedQuery):
 
     def _attach_extra_data(self) -> "CommentNotificationQuery":
         """Attach the user's comment votes to the query."""
-        vote_subquery = (
-            self.request.query(CommentVote)
-            .filter(
+        query = self.outerjoin(
+            CommentVote,
+            and_(
                 CommentVote.comment_id == CommentNotification.comment_id,
                 CommentVote.user == self.request.user,
-            )
-            .exists()
-            .label("user_voted")
+            ),
         )
-        return self.add_columns(vote_subquery)
+        query = query.add_columns(label("voted_time", CommentVote.created_time))
+
+        return query
 
     def join_all_relationships(self) -> "CommentNotificationQuery":
         """Eagerly join the comment, topic, and group to the notification."""
@@ -65,7 +66,7 @@ class CommentNotificationQuery(PaginatedQuery):
             notification.comment.user_voted = False
         else:
             notification = result.CommentNotification
-            notification.comment.user_voted = result.user_voted
+            notification.comment.user_voted = bool(result.voted_time)
 
         return notification
 
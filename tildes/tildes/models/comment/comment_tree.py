@@ -5,7 +5,7 @@
 
 from collections import Counter
 from datetime import datetime
-from typing import Iterator, List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from prometheus_client import Histogram
 from wrapt import ObjectProxy
@@ -22,11 +22,15 @@ class CommentTree:
 
     def __init__(
         self,
-        comments: Sequence[Comment],
+        comments: Iterable[Comment],
         sort: CommentTreeSortOption,
         viewer: Optional[User] = None,
     ):
-        """Create a sorted CommentTree from a flat list of Comments."""
+        """Create a sorted CommentTree from a flat iterable of Comments.
+
+        The comments are only iterated over once, so this can be passed a query
+        directly as well as a list.
+        """
         self.tree: List[CommentInTree] = []
         self.sort = sort
         self.viewer = viewer
@@ -38,9 +42,13 @@ class CommentTree:
             key=lambda c: c.created_time,
         )
 
-        self.comments_by_id = {comment.comment_id: comment for comment in comments}
+        self.comments_by_id: Dict[int, CommentInTree] = {
+            comment.comment_id: comment for comment in self.comments
+        }
 
-        self._build_tree()
+        if self.comments:
+            with self._building_histogram().time():
+                self._build_tree()
 
         # The method of building the tree already sorts it by posting time, so there's
         # no need to sort again if that's the desired sorting. Note also that because
@@ -188,33 +196,52 @@ class CommentTree:
 
         return None
 
-    def _sorting_histogram(self) -> Histogram:
-        """Return the (labeled) histogram to use for timing the sorting."""
+    @property
+    def _num_comments_range(self) -> str:
+        """Return an "order of magnitude" label for the number of comments."""
         num_comments = len(self.comments)
 
-        # make an "order of magnitude" label based on the number of comments
         if num_comments == 0:
-            raise ValueError("Attempting to time an empty comment tree sort")
+            raise ValueError("Attempting to label an empty comment tree")
         if num_comments < 10:
-            num_comments_range = "1 - 9"
-        elif num_comments < 100:
-            num_comments_range = "10 - 99"
-        elif num_comments < 1000:
-            num_comments_range = "100 - 999"
-        else:
-            num_comments_range = "1000+"
+            return "1 - 9"
+        if num_comments < 100:
+            return "10 - 99"
+        if num_comments < 1000:
+            return "100 - 999"
+
+        return "1000+"
 
+    def _building_histogram(self) -> Histogram:
+        """Return the (labeled) histogram to use for timing building the tree."""
+        return get_histogram(
+            "comment_tree_building", num_comments_range=self._num_comments_range
+        )
+
+    def _sorting_histogram(self) -> Histogram:
+        """Return the (labeled) histogram to use for timing the sorting."""
         return get_histogram(
             "comment_tree_sorting",
-            num_comments_range=num_comments_range,
+            num_comments_range=self._num_comments_range,
             order=self.sort.name,
         )
 
+    def _is_viewers_comment(self, comment: Comment) -> bool:
+        """Return whether the comment was posted by the viewer of the tree.
+
+        This only compares the user IDs, since it's called for every comment in the
+        tree and the viewer's ID is all that's needed to identify them.
+        """
+        if not self.viewer:
+            return False
+
+        return comment.user_id == self.viewer.user_id
+
     def collapse_from_labels(self) -> None:
         """Collapse comments based on how they've been labeled."""
         for comment in self.comments:
             # never affect the viewer's own comments
-            if comment.user == self.viewer:
+            if self._is_viewers_comment(comment):
                 continue
 
             if comment.is_label_active("noise"):
@@ -231,7 +258,7 @@ class CommentTree:
                 continue
 
             # don't apply to the viewer's own comments
-            if comment.user == self.viewer:
+            if self._is_viewers_comment(comment):
                 continue
 
             # uncollapse the comment (as long as it hasn't already had its state set)
@@ -272,7 +299,7 @@ class CommentInTree(ObjectProxy):
         self.replies: List[CommentInTree] = []
         self.has_visible_descendant = False
         self.num_children = 0
-        self.depth: Optional[int] = None
+        self.depth = 0
 
     @property
     def has_uncollapsed_descendant(self) -> bool:
@@ -221,8 +221,15 @@ def create_inherited_tables(
         "FOREIGN KEY (topic_id) REFERENCES topics (topic_id)"
     )
 
-    ix_name = naming["ix"] % {"table_name": "log_topics", "column_0_name": "topic_id"}
-    connection.execute(f"CREATE INDEX {ix_name} ON log_topics (topic_id)")
+    # used for fetching a topic's log entries newest first, as well as any lookups by
+    # topic_id alone
+    ix_name = naming["ix"] % {
+        "table_name": "log_topics",
+        "column_0_name": "topic_id_event_time_desc",
+    }
+    connection.execute(
+        f"CREATE INDEX {ix_name} ON log_topics (topic_id, event_time DESC)"
+    )
 
     # log_comments
     connection.execute(
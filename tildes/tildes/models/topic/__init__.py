@@ -1,6 +1,6 @@
 """Contains models related to topics."""
 
-from .topic import EDIT_GRACE_PERIOD, Topic, VOTING_PERIOD
+from .topic import EDIT_GRACE_PERIOD, Topic, TopicUserContext, VOTING_PERIOD
 from .topic_bookmark import TopicBookmark
 from .topic_ignore import TopicIgnore
 from .topic_query import TopicQuery
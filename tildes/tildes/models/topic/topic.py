@@ -3,6 +3,7 @@
 
 """Contains the Topic class."""
 
+from collections import namedtuple
 from datetime import datetime, timedelta
 from itertools import chain
 from pathlib import PurePosixPath
@@ -53,6 +54,11 @@ EDIT_GRACE_PERIOD = timedelta(minutes=5)
 # topics can no longer be voted on when they're older than this
 VOTING_PERIOD = timedelta(days=30)
 
+# data about the topic that's specific to the user viewing it, set by TopicQuery
+TopicUserContext = namedtuple(
+    "TopicUserContext", ["user_voted", "last_visit_time", "comments_since_last_visit"]
+)
+
 
 class Topic(DatabaseModel):
     """Model for a topic on the site.
@@ -146,6 +152,48 @@ class Topic(DatabaseModel):
         ),
         Index("ix_topics_num_comments_keyset", desc(num_comments), desc(topic_id)),
         Index("ix_topics_num_votes_keyset", desc(num_votes), desc(topic_id)),
+        # Partial indexes for keyset pagination of (non-deleted/removed) topics in
+        # specific groups, for each of the listing sort columns
+        Index(
+            "ix_topics_group_id_created_time_keyset",
+            group_id,
+            desc(created_time),
+            desc(topic_id),
+            postgresql_where=text("NOT is_deleted AND NOT is_removed"),
+        ),
+        Index(
+            "ix_topics_group_id_last_activity_time_keyset",
+            group_id,
+            desc(last_activity_time),
+            desc(topic_id),
+            postgresql_where=text("NOT is_deleted AND NOT is_removed"),
+        ),
+        Index(
+            "ix_topics_group_id_last_interesting_activity_time_keyset",
+            group_id,
+            desc(last_interesting_activity_time),
+            desc(topic_id),
+            postgresql_where=text("NOT is_deleted AND NOT is_removed"),
+        ),
+        Index(
+            "ix_topics_group_id_num_comments_keyset",
+            group_id,
+            desc(num_comments),
+            desc(topic_id),
+            postgresql_where=text("NOT is_deleted AND NOT is_removed"),
+        ),
+        Index(
+            "ix_topics_group_id_num_votes_keyset",
+            group_id,
+            desc(num_votes),
+            desc(topic_id),
+            postgresql_where=text("NOT is_deleted AND NOT is_removed"),
+        ),
+    )
+
+    # default for when no user-specific data has been merged onto the topic
+    user_context = TopicUserContext(
+        user_voted=False, last_visit_time=None, comments_since_last_visit=None
     )
 
     @hybrid_property  # pylint: disable=used-before-assignment
@@ -622,3 +670,18 @@ class Topic(DatabaseModel):
     def was_posted_by_scheduler(self) -> bool:
         """Return whether this topic was posted automatically by the topic scheduler."""
         return bool(self.schedule_id)
+
+    @property
+    def user_voted(self) -> bool:
+        """Return whether the viewing user has voted on the topic."""
+        return self.user_context.user_voted
+
+    @property
+    def last_visit_time(self) -> Optional[datetime]:
+        """Return the time of the viewing user's last visit to the topic (if any)."""
+        return self.user_context.last_visit_time
+
+    @property
+    def comments_since_last_visit(self) -> Optional[int]:
+        """Return how many comments were posted since the user's last visit (if any)."""
+        return self.user_context.comments_since_last_visit
@@ -3,24 +3,49 @@
 
 """Contains the TopicQuery class."""
 
-from typing import Any, Sequence
+from typing import Any, Iterator, List, Sequence, Union
 
+from cachetools import TTLCache
 from pyramid.request import Request
-from sqlalchemy import func
+from sqlalchemy import event, func
 from sqlalchemy.sql.expression import and_, desc, label, text
+from sqlalchemy_utils import Ltree
 
 from tildes.enums import TopicSortOption
 from tildes.lib.datetime import SimpleHoursPeriod, utc_now
 from tildes.models.group import Group
 from tildes.models.pagination import PaginatedQuery
 
-from .topic import Topic
+from .topic import Topic, TopicUserContext
 from .topic_bookmark import TopicBookmark
 from .topic_ignore import TopicIgnore
 from .topic_visit import TopicVisit
 from .topic_vote import TopicVote
 
 
+# the column that topics should be sorted by for each TopicSortOption
+SORT_COLUMNS = {
+    TopicSortOption.VOTES: Topic.num_votes,
+    TopicSortOption.COMMENTS: Topic.num_comments,
+    TopicSortOption.NEW: Topic.created_time,
+    TopicSortOption.ACTIVITY: Topic.last_interesting_activity_time,
+    TopicSortOption.ALL_ACTIVITY: Topic.last_activity_time,
+}
+
+# Groups are rarely added or moved, so the IDs of each group's subgroups are cached in
+# the process for a short time, and only looked up again once that expires.
+_GROUP_IDS_WITH_SUBGROUPS_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=60)
+
+
+@event.listens_for(Group, "after_insert")
+@event.listens_for(Group, "after_update")
+@event.listens_for(Group, "after_delete")
+def _clear_group_ids_cache(*args: Any) -> None:
+    """Clear the cached subgroup IDs when a group changes in this process."""
+    # pylint: disable=unused-argument
+    _GROUP_IDS_WITH_SUBGROUPS_CACHE.clear()
+
+
 class TopicQuery(PaginatedQuery):
     """Specialized query class for Topics."""
 
@@ -40,18 +65,32 @@ class TopicQuery(PaginatedQuery):
 
         self.filter_ignored = False
 
+    def __iter__(self) -> Iterator[Topic]:
+        """Iterate over the topics, merging the user's vote and visit data onto them.
+
+        The vote and visit data is fetched after the topics themselves, by a separate
+        query that covers all of the topics at once, so the main query doesn't need to
+        join any of the user's votes or visits.
+        """
+        topics: List[Topic] = list(super().__iter__())
+
+        if self.request.user and topics:
+            self._merge_vote_and_visit_data(topics)
+
+        return iter(topics)
+
     def _attach_extra_data(self) -> "TopicQuery":
         """Attach the extra user data to the query."""
         if not self.request.user:
             return self
 
         # pylint: disable=protected-access
-        return (
-            self._attach_vote_data()
-            ._attach_visit_data()
-            ._attach_bookmark_data()
-            ._attach_ignored_data()
-        )
+        query = self._attach_bookmark_data()._attach_ignored_data()
+
+        if self._only_user_voted:
+            query = query._restrict_to_user_voted()
+
+        return query
 
     def _finalize(self) -> "TopicQuery":
         """Finalize the query before it's executed."""
@@ -63,19 +102,15 @@ class TopicQuery(PaginatedQuery):
 
         return self
 
-    def _attach_vote_data(self) -> "TopicQuery":
-        """Join the data related to whether the user has voted on the topic."""
-        query = self.join(
+    def _restrict_to_user_voted(self) -> "TopicQuery":
+        """Join the user's votes to restrict to only topics they've voted on."""
+        return self.join(
             TopicVote,
             and_(
                 TopicVote.topic_id == Topic.topic_id,
                 TopicVote.user == self.request.user,
             ),
-            isouter=(not self._only_user_voted),
         )
-        query = query.add_columns(label("voted_time", TopicVote.created_time))
-
-        return query
 
     def _attach_bookmark_data(self) -> "TopicQuery":
         """Join the data related to whether the user has bookmarked the topic."""
@@ -91,10 +126,29 @@ class TopicQuery(PaginatedQuery):
 
         return query
 
-    def _attach_visit_data(self) -> "TopicQuery":
-        """Join the data related to the user's last visit to the topic(s)."""
-        # subquery using LATERAL to select only the newest visit for each topic
-        lateral_subquery = (
+    def _attach_ignored_data(self) -> "TopicQuery":
+        """Join the data related to whether the user has ignored the topic."""
+        query = self.join(
+            TopicIgnore,
+            and_(
+                TopicIgnore.topic_id == Topic.topic_id,
+                TopicIgnore.user == self.request.user,
+            ),
+            isouter=(not self._only_ignored),
+        )
+        query = query.add_columns(label("ignored_time", TopicIgnore.created_time))
+
+        return query
+
+    def _merge_vote_and_visit_data(self, topics: List[Topic]) -> None:
+        """Fetch the user's votes and last visits for the topics and merge them on.
+
+        This is done with a single query covering all of the topics, which joins the
+        user's vote and (using LATERAL) their newest visit to each one.
+        """
+        topic_ids = [topic.topic_id for topic in topics]
+
+        visit_subquery = (
             self.request.db_session.query(
                 TopicVisit.visit_time, TopicVisit.num_comments
             )
@@ -109,26 +163,40 @@ class TopicQuery(PaginatedQuery):
             .lateral()
         )
 
-        # join on "true" since the subquery already restricts to the row we want
-        query = self.outerjoin(lateral_subquery, text("true"))
-
-        query = query.add_columns(lateral_subquery)
+        user_data = (
+            self.request.db_session.query(
+                Topic.topic_id,
+                label("voted_time", TopicVote.created_time),
+                visit_subquery.c.visit_time,
+                visit_subquery.c.num_comments,
+            )
+            .outerjoin(
+                TopicVote,
+                and_(
+                    TopicVote.topic_id == Topic.topic_id,
+                    TopicVote.user == self.request.user,
+                ),
+            )
+            # join on "true" since the subquery already restricts to the row we want
+            .outerjoin(visit_subquery, text("true"))
+            .filter(Topic.topic_id.in_(topic_ids))  # type: ignore
+        )
+        user_data_by_topic_id = {row.topic_id: row for row in user_data}
 
-        return query
+        for topic in topics:
+            row = user_data_by_topic_id[topic.topic_id]
 
-    def _attach_ignored_data(self) -> "TopicQuery":
-        """Join the data related to whether the user has ignored the topic."""
-        query = self.join(
-            TopicIgnore,
-            and_(
-                TopicIgnore.topic_id == Topic.topic_id,
-                TopicIgnore.user == self.request.user,
-            ),
-            isouter=(not self._only_ignored),
-        )
-        query = query.add_columns(label("ignored_time", TopicIgnore.created_time))
+            comments_since_last_visit = None
+            if row.num_comments is not None:
+                new_comments = topic.num_comments - row.num_comments
+                # prevent showing negative "new comments" due to deletions
+                comments_since_last_visit = new_comments if new_comments > 0 else 0
 
-        return query
+            topic.user_context = TopicUserContext(
+                user_voted=bool(row.voted_time),
+                last_visit_time=row.visit_time,
+                comments_since_last_visit=comments_since_last_visit,
+            )
 
     @staticmethod
     def _process_result(result: Any) -> Topic:
@@ -136,25 +204,16 @@ class TopicQuery(PaginatedQuery):
         if isinstance(result, Topic):
             # the result is already a Topic, no merging needed
             topic = result
-            topic.user_voted = False
-            topic.bookmark_created_time = None
-            topic.last_visit_time = None
-            topic.comments_since_last_visit = None
+            topic.user_bookmarked = False
             topic.user_ignored = False
         else:
             topic = result.Topic
 
-            topic.user_voted = bool(result.voted_time)
             topic.user_bookmarked = bool(result.bookmarked_time)
             topic.user_ignored = bool(result.ignored_time)
 
-            topic.last_visit_time = result.visit_time
-
-            topic.comments_since_last_visit = None
-            if result.num_comments is not None:
-                new_comments = topic.num_comments - result.num_comments
-                # prevent showing negative "new comments" due to deletions
-                topic.comments_since_last_visit = max(new_comments, 0)
+        # the vote and visit data is merged on afterwards, if the user is logged in
+        topic.user_context = Topic.user_context
 
         return topic
 
@@ -162,17 +221,7 @@ class TopicQuery(PaginatedQuery):
         self, sort: TopicSortOption, is_desc: bool = True
     ) -> "TopicQuery":
         """Apply a TopicSortOption sorting method (generative)."""
-        if sort == TopicSortOption.VOTES:
-            self._sort_column = Topic.num_votes
-        elif sort == TopicSortOption.COMMENTS:
-            self._sort_column = Topic.num_comments
-        elif sort == TopicSortOption.NEW:
-            self._sort_column = Topic.created_time
-        elif sort == TopicSortOption.ACTIVITY:
-            self._sort_column = Topic.last_interesting_activity_time
-        elif sort == TopicSortOption.ALL_ACTIVITY:
-            self._sort_column = Topic.last_activity_time
-
+        self._sort_column = SORT_COLUMNS[sort]
         self.sort_desc = is_desc
 
         return self
@@ -182,15 +231,32 @@ class TopicQuery(PaginatedQuery):
     ) -> "TopicQuery":
         """Restrict the topics to inside specific groups (generative)."""
         if include_subgroups:
-            query_paths = [group.path for group in groups]
-            group_ids = self.request.db_session.query(Group.group_id).filter(
-                Group.path.descendant_of(query_paths)
-            )
+            group_ids = self._get_group_ids_with_subgroups(groups)
         else:
             group_ids = [group.group_id for group in groups]
 
         return self.filter(Topic.group_id.in_(group_ids))  # type: ignore
 
+    def _get_group_ids_with_subgroups(self, groups: Sequence[Group]) -> List[int]:
+        """Return the IDs of the groups and all their subgroups (cached)."""
+        cache_key = tuple(sorted(str(group.path) for group in groups))
+
+        cached = _GROUP_IDS_WITH_SUBGROUPS_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        query_paths = [group.path for group in groups]
+        group_ids = [
+            group_id
+            for (group_id,) in self.request.db_session.query(Group.group_id).filter(
+                Group.path.descendant_of(query_paths)
+            )
+        ]
+
+        _GROUP_IDS_WITH_SUBGROUPS_CACHE[cache_key] = group_ids
+
+        return group_ids
+
     def inside_time_period(self, period: SimpleHoursPeriod) -> "TopicQuery":
         """Restrict the topics to inside a time period (generative)."""
         # if the time period is too long, this will crash by creating a datetime outside
@@ -203,7 +269,7 @@ class TopicQuery(PaginatedQuery):
 
         return self.filter(Topic.created_time > start_time)
 
-    def has_tag(self, tag: str) -> "TopicQuery":
+    def has_tag(self, tag: Union[str, Ltree]) -> "TopicQuery":
         """Restrict the topics to ones with a specific tag (generative).
 
         Note that this method searches for topics that have any tag that either starts
@@ -211,9 +277,21 @@ class TopicQuery(PaginatedQuery):
         """
         queries = [f"{tag}.*", f"*.{tag}"]
 
-        # pylint: disable=protected-access
+        # This uses the ltree[] ? lquery[] operator, which ix_topics_tags_gist supports,
+        # so both patterns are checked in a single index scan. Array containment (@>)
+        # would only be able to find exact matches.
         return self.filter(Topic.tags.lquery(queries))  # type: ignore
 
+    def exclude_tags(self, tags: Sequence[str]) -> "TopicQuery":
+        """Exclude topics with any of the tags, or any of their sub-tags (generative).
+
+        The tags are converted to a single array of lquery patterns, which excludes any
+        topic where one of its tags matches one of the patterns.
+        """
+        queries = [f"{tag.replace(' ', '_')}.*" for tag in tags]
+
+        return self.filter(~Topic.tags.lquery(queries))  # type: ignore
+
     def search(self, query: str) -> "TopicQuery":
         """Restrict the topics to ones that match a search query (generative)."""
         return self.filter(Topic.search_tsv.op("@@")(func.websearch_to_tsquery(query)))
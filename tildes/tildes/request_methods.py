@@ -15,7 +15,8 @@ from tildes.lib.ratelimit import (
     RateLimitedAction,
     RateLimitResult,
 )
-from tildes.models.user import UserRateLimit
+from tildes.models.group import Group
+from tildes.models.user import UserGroupSettings, UserRateLimit
 
 
 def get_redis_connection(request: Request) -> Redis:
@@ -191,6 +192,21 @@ def current_theme(request: Request) -> str:
     return cookie_theme or user_theme or "white"
 
 
+def user_group_settings(request: Request) -> Optional[UserGroupSettings]:
+    """Return the user's settings for the current group, if the context is a group."""
+    if not (request.user and isinstance(request.context, Group)):
+        return None
+
+    return (
+        request.query(UserGroupSettings)
+        .filter(
+            UserGroupSettings.user == request.user,
+            UserGroupSettings.group == request.context,
+        )
+        .one_or_none()
+    )
+
+
 def includeme(config: Configurator) -> None:
     """Attach the request methods to the Pyramid request object."""
     config.add_request_method(is_bot, "is_bot", reify=True)
@@ -208,6 +224,7 @@ def includeme(config: Configurator) -> None:
     # pylint: enable=unnecessary-lambda
 
     config.add_request_method(current_theme, "current_theme", reify=True)
+    config.add_request_method(user_group_settings, "user_group_settings", reify=True)
 
     config.add_request_method(check_rate_limit, "check_rate_limit")
     config.add_request_method(apply_rate_limit, "apply_rate_limit")
@@ -31,7 +31,9 @@ class TopicSchema(Schema):
     rendered_html = String(dump_only=True)
     link = URL(schemes={"http", "https"}, allow_none=True)
     created_time = DateTime(dump_only=True)
-    tags = List(String())
+    # post_group_topics() requires a tags argument, so default to no tags if the field
+    # wasn't submitted at all
+    tags = List(String(), missing=list)
 
     user = Nested(UserSchema, dump_only=True)
     group = Nested(GroupSchema, dump_only=True)
@@ -55,9 +57,16 @@ class TopicSchema(Schema):
         if "tags" not in data:
             return data
 
+        # tags can be submitted as a comma-separated string, which webargs passes in as
+        # a single-item list when parsing a form, so split every value on commas
+        values = data["tags"]
+        if isinstance(values, str):
+            values = [values]
+        split_tags = [tag for value in values for tag in value.split(",")]
+
         tags: typing.List[str] = []
 
-        for tag in data["tags"]:
+        for tag in split_tags:
             tag = tag.lower()
 
             # replace underscores with spaces
@@ -5,19 +5,21 @@
 
 from collections import namedtuple
 from difflib import SequenceMatcher
-from typing import Any, Optional, Union
+from typing import Any, List, Optional, Union
 
-from marshmallow import missing, ValidationError
+from marshmallow import missing
 from marshmallow.fields import Boolean, String
 from pyramid.httpexceptions import HTTPFound
 from pyramid.renderers import render_to_response
 from pyramid.request import Request
 from pyramid.response import Response
 from pyramid.view import view_config
-from sqlalchemy import cast
-from sqlalchemy.sql.expression import any_, desc, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.expression import desc, text
 from sqlalchemy_utils import Ltree
 from webargs.pyramidparser import use_kwargs
+from zope.sqlalchemy import mark_changed
 
 from tildes.enums import (
     CommentLabelOption,
@@ -26,13 +28,11 @@ from tildes.enums import (
     LogEventType,
     TopicSortOption,
 )
-from tildes.lib.database import TagList
 from tildes.lib.datetime import SimpleHoursPeriod, utc_now
 from tildes.models.comment import Comment, CommentNotification, CommentTree
 from tildes.models.group import Group, GroupWikiPage
 from tildes.models.log import LogComment, LogTopic
 from tildes.models.topic import Topic, TopicSchedule, TopicVisit
-from tildes.models.user import UserGroupSettings
 from tildes.schemas.comment import CommentSchema
 from tildes.schemas.fields import ShortTimePeriod
 from tildes.schemas.listing import TopicListingSchema
@@ -43,11 +43,30 @@ from tildes.views.financials import get_financial_data
 
 DefaultSettings = namedtuple("DefaultSettings", ["order", "period"])
 
+SHORT_TIME_PERIOD_FIELD = ShortTimePeriod()
+
+# the types of log entries that are shown on a topic's page
+TOPIC_LOG_VISIBLE_EVENTS = (
+    LogEventType.TOPIC_LINK_EDIT,
+    LogEventType.TOPIC_LOCK,
+    LogEventType.TOPIC_MOVE,
+    LogEventType.TOPIC_REMOVE,
+    LogEventType.TOPIC_PINNED,
+    LogEventType.TOPIC_TAG,
+    LogEventType.TOPIC_TITLE_EDIT,
+    LogEventType.TOPIC_UNLOCK,
+    LogEventType.TOPIC_UNREMOVE,
+    LogEventType.TOPIC_UNPINNED,
+)
+
+# the "standard" time periods offered in the listing's period dropdown
+STANDARD_PERIOD_OPTIONS = [SimpleHoursPeriod(hours) for hours in (1, 12, 24, 72, 168)]
+
 
 @view_config(route_name="group_topics", request_method="POST", permission="post_topic")
-@use_kwargs(TopicSchema(only=("title", "markdown", "link")))
+@use_kwargs(TopicSchema(only=("title", "markdown", "link", "tags")))
 @use_kwargs(
-    {"tags": String(missing=""), "confirm_repost": Boolean(missing=False)},
+    {"confirm_repost": Boolean(missing=False)},
     locations=("form",),  # will crash due to trying to find JSON data without this
 )
 def post_group_topics(
@@ -55,7 +74,7 @@ def post_group_topics(
     title: str,
     markdown: str,
     link: str,
-    tags: str,
+    tags: List[str],
     confirm_repost: bool,
 ) -> Union[HTTPFound, Response]:
     """Post a new topic to a group."""
@@ -86,7 +105,7 @@ def post_group_topics(
                     "title": title,
                     "link": link,
                     "markdown": markdown,
-                    "tags": tags,
+                    "tags": ",".join(tags),
                     "previous_topics": previous_topics,
                 },
                 request=request,
@@ -112,13 +131,8 @@ def post_group_topics(
             group=group, author=request.user, title=title, markdown=markdown
         )
 
-    try:
-        new_topic.tags = tags.split(",")
-    except ValidationError:
-        raise ValidationError({"tags": ["Invalid tags"]})
-
     # remove any tag that's the same as the group's name
-    new_topic.tags = [tag for tag in new_topic.tags if tag != str(group.path)]
+    new_topic.tags = [tag for tag in tags if tag != str(group.path)]
 
     request.apply_rate_limit("topic_post")
 
@@ -168,6 +182,8 @@ def get_group_topics(  # noqa
         # on the home page, include topics from the user's subscribed groups
         # (or all groups, if logged-out)
         if request.user:
+            # GroupSubscription.group is eager-loaded, so this is a single query (that
+            # the templates reuse) and not one query per subscription
             groups = [sub.group for sub in request.user.subscriptions]
         else:
             groups = [
@@ -210,7 +226,7 @@ def get_group_topics(  # noqa
 
     # restrict to a specific tag, if we're viewing a single one
     if tag:
-        query = query.has_tag(str(tag))
+        query = query.has_tag(tag)
 
     # apply before/after pagination restrictions if relevant
     if before:
@@ -221,11 +237,7 @@ def get_group_topics(  # noqa
 
     # apply topic tag filters unless they're disabled or viewing a single tag
     if request.user and request.user.filtered_topic_tags and not (tag or unfiltered):
-        query = query.filter(
-            ~Topic.tags.descendant_of(  # type: ignore
-                any_(cast(request.user.filtered_topic_tags, TagList))
-            )
-        )
+        query = query.exclude_tags(request.user.filtered_topic_tags)
 
     topics = query.get_page(per_page)
 
@@ -244,7 +256,7 @@ def get_group_topics(  # noqa
 
         pinned_topics = pinned_query.all()
 
-    period_options = [SimpleHoursPeriod(hours) for hours in (1, 12, 24, 72, 168)]
+    period_options = list(STANDARD_PERIOD_OPTIONS)
 
     # add the current period to the bottom of the dropdown if it's not one of the
     # "standard" ones
@@ -415,15 +427,14 @@ def get_topic(request: Request) -> dict:
 
     # deleted and removed comments need to be included since they're necessary for
     # building the tree if they have replies
-    comments = (
+    comments_query = (
         request.query(Comment)
         .include_deleted()
         .include_removed()
         .filter(Comment.topic == topic)
         .order_by(Comment.created_time)
-        .all()
     )
-    tree = CommentTree(comments, CommentTreeSortOption.NEWEST, request.user)
+    tree = CommentTree(comments_query, CommentTreeSortOption.NEWEST, request.user)
 
     # check for link information (content metadata) to display
     if topic.is_link_type:
@@ -442,21 +453,11 @@ def get_topic(request: Request) -> dict:
         content_metadata = None
 
     # check if there are any items in the log to show
-    visible_events = (
-        LogEventType.TOPIC_LINK_EDIT,
-        LogEventType.TOPIC_LOCK,
-        LogEventType.TOPIC_MOVE,
-        LogEventType.TOPIC_REMOVE,
-        LogEventType.TOPIC_PINNED,
-        LogEventType.TOPIC_TAG,
-        LogEventType.TOPIC_TITLE_EDIT,
-        LogEventType.TOPIC_UNLOCK,
-        LogEventType.TOPIC_UNREMOVE,
-        LogEventType.TOPIC_UNPINNED,
-    )
     log = (
         request.query(LogTopic)
-        .filter(LogTopic.topic == topic, LogTopic.event_type.in_(visible_events))
+        .filter(
+            LogTopic.topic == topic, LogTopic.event_type.in_(TOPIC_LOG_VISIBLE_EVENTS)
+        )
         .order_by(desc(LogTopic.event_time))
         .all()
     )
@@ -464,7 +465,17 @@ def get_topic(request: Request) -> dict:
     tree.collapse_from_labels()
 
     if request.user:
-        request.db_session.add(TopicVisit(request.user, topic))
+        # record the visit with a before-commit hook, which runs the insert at the
+        # end of the transaction so it isn't autoflushed partway through rendering
+        # (the response still waits for it to complete)
+        visit_statement = insert(TopicVisit.__table__).values(
+            user_id=request.user.user_id,
+            topic_id=topic.topic_id,
+            num_comments=topic.num_comments,
+        )
+        request.tm.get().addBeforeCommitHook(
+            _execute_statement, args=(request, visit_statement)
+        )
 
         # collapse old comments if the user has a previous visit to the topic
         # (and doesn't have that behavior disabled)
@@ -502,20 +513,16 @@ def post_comment_on_topic(request: Request, markdown: str) -> HTTPFound:
     raise HTTPFound(location=topic.permalink)
 
 
+def _execute_statement(request: Request, statement: Executable) -> None:
+    """Execute a statement in the request's database session."""
+    request.db_session.execute(statement)
+    mark_changed(request.db_session)
+
+
 def _get_default_settings(
     request: Request, order: Optional[TopicSortOption]
 ) -> DefaultSettings:
-    if isinstance(request.context, Group) and request.user:
-        user_settings = (
-            request.query(UserGroupSettings)
-            .filter(
-                UserGroupSettings.user == request.user,
-                UserGroupSettings.group == request.context,
-            )
-            .one_or_none()
-        )
-    else:
-        user_settings = None
+    user_settings = request.user_group_settings
 
     if user_settings and user_settings.default_order:
         default_order = user_settings.default_order
@@ -531,10 +538,10 @@ def _get_default_settings(
 
     if user_settings and user_settings.default_period:
         user_default = user_settings.default_period
-        default_period = ShortTimePeriod().deserialize(user_default)
+        default_period = SHORT_TIME_PERIOD_FIELD.deserialize(user_default)
     elif request.user and request.user.home_default_period:
         user_default = request.user.home_default_period
-        default_period = ShortTimePeriod().deserialize(user_default)
+        default_period = SHORT_TIME_PERIOD_FIELD.deserialize(user_default)
     else:
         # Overall default periods, if the user doesn't have either a group-specific or a
         # home default set up: